@@ -0,0 +1,183 @@
+import argparse
+import hashlib
+import io
+import json
+import os
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import pandas as pd
+
+from mla_config import load_config
+from mla_parse import parse_filename, parse_report
+
+MANIFEST_NAME = "manifest.json"
+SEGMENT_SIZE = 500  # reports per segment when packing loose history files
+CHUNK_SIZE = 100  # reports per rebuild task
+
+
+# --- Writing segments ---
+def write_members(history_path, members):
+    """Write (filename, data, saleyard, report_date) members to one compressed zip segment.
+
+    The segment is only visible under its final name once fully written.
+    """
+    os.makedirs(history_path, exist_ok=True)
+    stamp = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+    segment_name = f"segment-{stamp}.zip"
+    segment_path = os.path.join(history_path, segment_name)
+    tmp_path = segment_path + ".tmp"
+
+    manifest = []
+    with zipfile.ZipFile(tmp_path, "w", compression=zipfile.ZIP_DEFLATED, compresslevel=9) as archive:
+        for filename, data, saleyard, report_date in members:
+            archive.writestr(filename, data)
+            manifest.append({
+                "file": filename,
+                "saleyard": saleyard,
+                "report_date": report_date,
+                "sha256": hashlib.sha256(data).hexdigest(),
+                "size": len(data)
+            })
+        archive.writestr(MANIFEST_NAME, json.dumps(manifest, indent=2))
+    os.replace(tmp_path, segment_path)
+    print(f"📦 Archived {len(manifest)} report(s) to {segment_name}")
+    return segment_path
+
+
+def write_segment(history_path, reports):
+    """Pack processed reports into one compressed zip segment with a manifest.
+
+    reports is a list of (file_path, saleyard, report_date). The source files
+    are removed once the segment is safely on disk.
+    """
+    if not reports:
+        return None
+
+    def members():
+        for file_path, saleyard, report_date in reports:
+            with open(file_path, "rb") as f:
+                yield os.path.basename(file_path), f.read(), saleyard, report_date
+
+    segment_path = write_members(history_path, members())
+    for file_path, _, _ in reports:
+        os.remove(file_path)
+    return segment_path
+
+
+def pack_loose(history_path):
+    """Move loose CSVs left in the history folder into archive segments."""
+    if not os.path.isdir(history_path):
+        return []
+    loose = sorted(name for name in os.listdir(history_path) if name.endswith(".csv"))
+    segments = []
+    for start in range(0, len(loose), SEGMENT_SIZE):
+        reports = []
+        for filename in loose[start:start + SEGMENT_SIZE]:
+            parsed = parse_filename(filename) or (None, None)
+            reports.append((os.path.join(history_path, filename),) + tuple(parsed))
+        segments.append(write_segment(history_path, reports))
+    return segments
+
+
+def compact_segments(history_path):
+    """Combine segments holding fewer than SEGMENT_SIZE reports into full ones.
+
+    Each merge writes a small segment, so without compaction daily runs pile
+    up many tiny zips. Originals are removed only after the new segments are
+    in place; a report archived more than once keeps its latest copy.
+    """
+    small = [path for path in list_segments(history_path) if len(read_manifest(path)) < SEGMENT_SIZE]
+    if len(small) < 2:
+        return []
+
+    # Segments sort oldest first, so later copies of a file replace earlier ones
+    latest = {}
+    for segment_path in small:
+        for entry in read_manifest(segment_path):
+            latest[entry["file"]] = (segment_path, entry)
+    entries = list(latest.values())
+
+    def members(chunk):
+        archives = {}
+        try:
+            for segment_path, entry in chunk:
+                if segment_path not in archives:
+                    archives[segment_path] = zipfile.ZipFile(segment_path)
+                yield entry["file"], archives[segment_path].read(entry["file"]), entry["saleyard"], entry["report_date"]
+        finally:
+            for archive in archives.values():
+                archive.close()
+
+    segments = []
+    for start in range(0, len(entries), SEGMENT_SIZE):
+        segments.append(write_members(history_path, members(entries[start:start + SEGMENT_SIZE])))
+    for segment_path in small:
+        os.remove(segment_path)
+    print(f"🗜️ Compacted {len(small)} segment(s) into {len(segments)}")
+    return segments
+
+
+# --- Reading segments ---
+def list_segments(history_path):
+    if not os.path.isdir(history_path):
+        return []
+    return sorted(
+        os.path.join(history_path, name)
+        for name in os.listdir(history_path)
+        if name.startswith("segment-") and name.endswith(".zip")
+    )
+
+
+def read_manifest(segment_path):
+    with zipfile.ZipFile(segment_path) as archive:
+        return json.loads(archive.read(MANIFEST_NAME))
+
+
+def read_reports(task):
+    """Parse a chunk of reports from one segment; runs in a worker process."""
+    segment_path, entries = task
+    frames = []
+    with zipfile.ZipFile(segment_path) as archive:
+        for entry in entries:
+            data = archive.read(entry["file"])
+            if hashlib.sha256(data).hexdigest() != entry["sha256"]:
+                print(f"⚠️ Checksum mismatch, skipping {entry['file']} in {os.path.basename(segment_path)}")
+                continue
+            lines = io.StringIO(data.decode("utf-8")).readlines()
+            df = parse_report(entry["file"], lines)
+            if df is not None:
+                frames.append(df)
+    return pd.concat(frames, ignore_index=True) if frames else None
+
+
+def read_archive(history_path, workers=None):
+    """Parse every archived report straight from the segments, in parallel across cores."""
+    tasks = []
+    for segment_path in list_segments(history_path):
+        manifest = read_manifest(segment_path)
+        for start in range(0, len(manifest), CHUNK_SIZE):
+            tasks.append((segment_path, manifest[start:start + CHUNK_SIZE]))
+    print(f"🗂️ {sum(len(entries) for _, entries in tasks)} report(s) in {len(tasks)} task(s)")
+    if not tasks:
+        return []
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return [df for df in pool.map(read_reports, tasks) if df is not None]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Pack loose MLA history CSVs into compressed archive segments and compact small segments."
+    )
+    parser.add_argument("--config", help="Path to mla_config.json (defaults to $MLA_CONFIG or ./mla_config.json)")
+    args = parser.parse_args(argv)
+
+    history_path = load_config(args.config)["history_dir"]
+    pack_loose(history_path)
+    compact_segments(history_path)
+
+
+if __name__ == "__main__":
+    main()
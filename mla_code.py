@@ -1,123 +1,74 @@
+import argparse
 import os
-import shutil
 import pandas as pd
-from datetime import datetime
+import mla_archive
+from mla_config import load_config
+from mla_parse import parse_report
 
-# --- Paths ---
-folder_path = "/home/mikey/MLA/downloads"
-history_path = "/home/mikey/MLA/history"
-output_csv = "/home/mikey/MLA/combined_mla_output.csv"
-output_excel = "/home/mikey/MLA/final_mla_output.xlsx"
-output_rows = []
+NUMERIC_COLS = [
+    "Head Count", "Head Change",
+    "Min Lwt c/kg", "Max Lwt c/kg", "Avg Lwt c/kg", "Avg Lwt Change",
+    "Min $/Head", "Max $/Head", "Avg $/Head"
+]
 
-print("🚀 Starting MLA merge process...")
-os.makedirs(history_path, exist_ok=True)
 
 # --- Step 1: Process each MLA file ---
-for filename in os.listdir(folder_path):
-    if not filename.endswith(".csv") or filename.startswith("combined"):
-        continue
-
-    file_path = os.path.join(folder_path, filename)
-    print(f"\n📄 Processing file: {filename}")
-
-    # --- Parse filename to get saleyard and date ---
-    if len(filename) > 15:
-        base_name = filename[:-4]  # Strip .csv
-        date_str_raw = base_name[-10:]  # Expecting DD-MM-YYYY
-        try:
-            report_date_str = datetime.strptime(date_str_raw, "%d-%m-%Y").strftime("%d/%m/%Y")
-        except ValueError:
-            print(f"⚠️ Invalid date format in filename, skipping: {filename}")
+def process_downloads(folder_path, history_path):
+    output_rows = []
+    processed = []
+    if not os.path.isdir(folder_path):
+        print(f"⚠️ Downloads folder not found: {folder_path}")
+        return output_rows
+
+    for filename in os.listdir(folder_path):
+        if not filename.endswith(".csv") or filename.startswith("combined"):
             continue
 
-        saleyard_guess = base_name[:-11].replace("_", " ").strip()
-        saleyard = saleyard_guess
-        print(f"📌 Parsed from filename → Saleyard: {saleyard}, Report Date: {report_date_str}")
-    else:
-        print(f"⚠️ Filename too short or malformed: {filename}")
-        continue
-
-    # --- Read file ---
-    with open(file_path, "r", encoding="utf-8") as f:
-        lines = f.readlines()
-
-    header = None
-    data_started = False
-
-    for i, line in enumerate(lines):
-        if line.strip().startswith("Category,"):
-            header = line.strip().split(",")
-            data_start_index = i + 1
-            data_started = True
-            break
-
-    if not data_started:
-        print(f"⚠️ Skipping file {filename} — no data table found.")
-        continue
-
-    # --- Extract data rows ---
-    data_rows = []
-    for line in lines[data_start_index:]:
-        if line.strip() == "":
-            break
-        fields = line.strip().split(",")
-        if len(fields) >= len(header):
-            data_rows.append(fields[:len(header)])
-
-    if not data_rows:
-        print(f"⚠️ No data rows found in {filename}. Skipping.")
-        continue
-
-    df = pd.DataFrame(data_rows, columns=header)
-
-    # --- Keep only relevant columns ---
-    keep_cols = [
-        "Category", "Weight Range", "Sale Prefix", "Head Count", "Head Change",
-        "Min Lwt c/kg", "Max Lwt c/kg", "Avg Lwt c/kg", "Avg Lwt Change",
-        "Min $/Head", "Max $/Head", "Avg $/Head"
-    ]
-    df = df[[col for col in keep_cols if col in df.columns]].copy()
-    df["Saleyard"] = saleyard
-    df["Report Date"] = report_date_str
-    output_rows.append(df)
-
-    # --- Move file to history ---
-    shutil.move(file_path, os.path.join(history_path, filename))
-    print(f"📦 Moved to history: {filename}")
-
-# --- Step 2: Save combined CSV ---
-if output_rows:
-    final_df = pd.concat(output_rows, ignore_index=True)
+        file_path = os.path.join(folder_path, filename)
+        print(f"\n📄 Processing file: {filename}")
+
+        # --- Read file ---
+        with open(file_path, "r", encoding="utf-8") as f:
+            lines = f.readlines()
+
+        df = parse_report(filename, lines)
+        if df is None:
+            continue
+        output_rows.append(df)
+        processed.append((file_path, df["Saleyard"].iat[0], df["Report Date"].iat[0]))
+
+    # --- Pack processed files into a compressed history segment ---
+    mla_archive.write_segment(history_path, processed)
+
+    return output_rows
+
+
+# --- Step 2 & 3: Save combined CSV and formatted Excel ---
+def write_outputs(output_rows, output_csv, output_excel, merge_existing=True):
+    final_df = pd.concat(output_rows, ignore_index=True).drop_duplicates()
 
     # Merge with existing Excel data if it exists
-    if os.path.exists(output_excel):
+    if merge_existing and os.path.exists(output_excel):
         existing = pd.read_excel(output_excel, sheet_name="All Data")
         final_df = pd.concat([existing, final_df], ignore_index=True).drop_duplicates()
 
-
     # Reorder columns if needed
     col_order = ["Saleyard", "Report Date"] + [col for col in final_df.columns if col not in ("Saleyard", "Report Date")]
     final_df = final_df[col_order]
 
     # --- Merge with previous combined output if it exists ---
-    if os.path.exists(output_csv):
+    if merge_existing and os.path.exists(output_csv):
         prev_df = pd.read_csv(output_csv)
         final_df = pd.concat([prev_df, final_df], ignore_index=True).drop_duplicates()
     final_df.to_csv(output_csv, index=False)
     print(f"\n✅ CSV saved: {output_csv}")
 
     # Convert numeric fields
-    numeric_cols = [
-        "Head Count", "Head Change",
-        "Min Lwt c/kg", "Max Lwt c/kg", "Avg Lwt c/kg", "Avg Lwt Change",
-        "Min $/Head", "Max $/Head", "Avg $/Head"
-    ]
-    for col in numeric_cols:
+    for col in NUMERIC_COLS:
         if col in final_df.columns:
             final_df[col] = pd.to_numeric(final_df[col], errors='coerce')
 
-    # --- Step 3: Save Excel with formatting ---
+    # --- Save Excel with formatting ---
     with pd.ExcelWriter(output_excel, engine="xlsxwriter") as writer:
         final_df.to_excel(writer, sheet_name="All Data", index=False)
         workbook = writer.book
@@ -140,5 +91,42 @@ if output_rows:
             format_sheet(df_cat, safe_sheet)
 
     print(f"✅ Excel with formatting saved: {output_excel}")
-else:
-    print("❌ No usable data found to merge.")
+
+
+def merge(config):
+    print("🚀 Starting MLA merge process...")
+    output_rows = process_downloads(config["download_dir"], config["history_dir"])
+    if output_rows:
+        write_outputs(output_rows, config["output_csv"], config["output_excel"])
+    else:
+        print("❌ No usable data found to merge.")
+    return bool(output_rows)
+
+
+def rebuild(config, workers=None):
+    """Re-parse every archived report in parallel and rewrite the merged outputs from scratch.
+
+    Loose CSVs left in the history folder are packed into segments first, so they are included.
+    """
+    print("🚀 Rebuilding merged data from the history archive...")
+    mla_archive.pack_loose(config["history_dir"])
+    output_rows = mla_archive.read_archive(config["history_dir"], workers)
+    if output_rows:
+        write_outputs(output_rows, config["output_csv"], config["output_excel"], merge_existing=False)
+    else:
+        print("❌ No usable data found in the archive.")
+    return bool(output_rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Merge downloaded MLA reports into the combined outputs.")
+    parser.add_argument("--config", help="Path to mla_config.json (defaults to $MLA_CONFIG or ./mla_config.json)")
+    parser.add_argument("--rebuild", action="store_true", help="Rebuild the outputs from the history archive instead (packs loose history CSVs into segments first)")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    config = load_config(args.config)
+    if args.rebuild:
+        rebuild(config, args.workers)
+    else:
+        merge(config)
@@ -0,0 +1,41 @@
+import json
+import os
+
+# --- Defaults ---
+# Relative paths are resolved against base_dir, which is itself relative to the config file
+DEFAULTS = {
+    "base_dir": ".",
+    "download_dir": "downloads",
+    "history_dir": "history",
+    "download_log": "download_log.csv",
+    "output_csv": "combined_mla_output.csv",
+    "output_excel": "final_mla_output.xlsx",
+    "dashboard_data": "dashboard_data.pkl",
+    "favourites": "favourites.csv",
+    "pipeline_state": "pipeline_state.json",
+    "reports_dir": "reports",
+    "profile_log": "profile_log.jsonl",
+    "download_interval_hours": 24
+}
+PATH_KEYS = [
+    "download_dir", "history_dir", "download_log", "output_csv", "output_excel",
+    "dashboard_data", "favourites", "pipeline_state", "reports_dir",
+    "profile_log"
+]
+
+
+def load_config(path=None):
+    """Read mla_config.json (or $MLA_CONFIG) over the defaults and resolve paths."""
+    path = path or os.environ.get("MLA_CONFIG", "mla_config.json")
+    config = dict(DEFAULTS)
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            config.update(json.load(f))
+
+    config_dir = os.path.dirname(os.path.abspath(path))
+    base_dir = os.path.abspath(os.path.join(config_dir, os.path.expanduser(config["base_dir"])))
+    config["base_dir"] = base_dir
+    config["config_path"] = os.path.abspath(path)
+    for key in PATH_KEYS:
+        config[key] = os.path.join(base_dir, os.path.expanduser(config[key]))
+    return config
@@ -1,41 +1,139 @@
 import streamlit as st
 import pandas as pd
 import datetime
-from io import BytesIO
+import json
+import os
+import time
+from contextlib import contextmanager
+import mla_reports
+from mla_config import load_config
 
 # --- Config ---
 st.set_page_config("MLA Saleyard Dashboard", layout="wide")
 
 # --- Load Data ---
+FILTER_CACHE_SIZE = 32
+config = load_config()
+
+@st.cache_resource(max_entries=1)
+def load_data(path, version):
+    # Shared by every session in the process, so it must never be mutated in place.
+    # version is the file's mtime, so a pipeline refresh replaces the cached dataset.
+    return mla_reports.load_dataset(path)
+
 @st.cache_data
-def load_data():
-    df = pd.read_excel("final_mla_output.xlsx")
-    df["Report Date"] = pd.to_datetime(df["Report Date"], dayfirst=True, errors='coerce')
-    for col in ["Saleyard", "Category", "Weight Range", "Sale Prefix"]:
-        df[col] = df[col].astype(str).str.strip()
-    fav_df = pd.read_csv("favourites.csv")
-    gus_row = fav_df[fav_df["User"] == "Gus"]
-    favourites = gus_row.iloc[0][1:].dropna().tolist() if not gus_row.empty else []
-    return df, favourites
+def load_favourites(path, version):
+    return mla_reports.load_favourites(path)
+
+def session_filter(key, compute):
+    # Per-session cache of small filter results, evicting the oldest entry when full
+    cache = st.session_state.setdefault("filter_cache", {})
+    if key not in cache:
+        if len(cache) >= FILTER_CACHE_SIZE:
+            cache.pop(next(iter(cache)))
+        cache[key] = compute()
+    return cache[key]
+
+def filter_step(rows, key, column, values):
+    # Caches row positions in the shared dataset rather than copied frames
+    return session_filter(key, lambda: rows[df[column].take(rows).isin(values).to_numpy()])
+
+# --- Profiling ---
+# Enable with ?profile=1 in the URL or MLA_PROFILE=1 in the environment
+PROFILE_LOG = os.environ.get("MLA_PROFILE_LOG", config["profile_log"])
+
+def frame_memory_mb(frame):
+    return round(frame.memory_usage(deep=True).sum() / 1024 ** 2, 2)
+
+@st.cache_resource(max_entries=1)
+def dataset_memory_mb(version, _df):
+    # Deep memory of the shared dataset is O(rows), so measure it once per data version
+    return frame_memory_mb(_df)
+
+class RerunProfiler:
+    def __init__(self, enabled):
+        self.enabled = enabled
+        self.started = time.perf_counter()
+        self.last_mark = self.started
+        self.overhead = 0.0
+        self.stages = []
+        self.filter_steps = []
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        overhead_before = self.overhead
+        yield
+        if self.enabled:
+            # Leave out time spent in track() calls made inside the stage
+            seconds = time.perf_counter() - start - (self.overhead - overhead_before)
+            self.stages.append({"stage": name, "seconds": round(seconds, 4)})
+        self.last_mark = time.perf_counter()
+
+    def track(self, step, frame, memory_mb=None):
+        # Time since the previous mark, plus the size of the frame after this filter step.
+        # memory_mb can be a callable returning a precomputed size for frames too big to measure each rerun.
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        self.filter_steps.append({
+            "step": step,
+            "seconds": round(now - self.last_mark, 4),
+            "rows": len(frame),
+            "memory_mb": memory_mb() if memory_mb else frame_memory_mb(frame)
+        })
+        # Restart after measuring memory so the profiler's own cost isn't charged to the next step
+        self.last_mark = time.perf_counter()
+        self.overhead += self.last_mark - now
+
+    def finish(self, filters):
+        if not self.enabled:
+            return
+        record = {
+            "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+            "total_seconds": round(time.perf_counter() - self.started, 4),
+            "filters": filters,
+            "stages": self.stages,
+            "filter_steps": self.filter_steps
+        }
+        with open(PROFILE_LOG, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, default=str) + "\n")
+
+        with st.expander(f"⏱️ Profiling — {record['total_seconds']:.2f}s this rerun"):
+            st.dataframe(pd.DataFrame(self.stages), hide_index=True, use_container_width=True)
+            st.dataframe(pd.DataFrame(self.filter_steps), hide_index=True, use_container_width=True)
+            st.caption(f"Appended to {PROFILE_LOG}")
+
+profiler = RerunProfiler(
+    st.query_params.get("profile") == "1" or os.environ.get("MLA_PROFILE") == "1"
+)
 
 # --- Load data ---
-df, favourites = load_data()
-df_filtered = df.copy()
+with profiler.stage("load_data"):
+    data_path = mla_reports.dataset_path(config)
+    data_version = os.path.getmtime(data_path)
+    df = load_data(data_path, data_version)
+    user_favourites = load_favourites(config["favourites"], os.path.getmtime(config["favourites"]))
+profiler.track("all data", df, memory_mb=lambda: dataset_memory_mb(data_version, df))
 
 # --- Sidebar Filters ---
 st.sidebar.header("🔍 Filters")
 
-date_filter = st.sidebar.selectbox("Report Date Range", [
-    "Last 7 Days", "Last 30 Days", "Last 60 Days", "Last 90 Days", "Last 180 Days"
-])
+user = st.sidebar.selectbox("User", list(user_favourites), key="user")
+favourites = user_favourites.get(user, [])
+
+date_filter = st.sidebar.selectbox("Report Date Range", list(mla_reports.DATE_WINDOWS))
 date_cutoffs = {
-    "Last 7 Days": datetime.datetime.today() - datetime.timedelta(days=7),
-    "Last 30 Days": datetime.datetime.today() - datetime.timedelta(days=30),
-    "Last 60 Days": datetime.datetime.today() - datetime.timedelta(days=60),
-    "Last 90 Days": datetime.datetime.today() - datetime.timedelta(days=90),
-    "Last 180 Days": datetime.datetime.today() - datetime.timedelta(days=180)
+    label: mla_reports.window_cutoff(days)
+    for label, days in mla_reports.DATE_WINDOWS.items()
 }
-df_filtered = df[df["Report Date"] >= date_cutoffs[date_filter]]
+filter_key = (data_version, date_filter, datetime.date.today())
+filter_rows = session_filter(
+    filter_key,
+    lambda: (df["Report Date"] >= date_cutoffs[date_filter]).to_numpy().nonzero()[0]
+)
+df_filtered = df.take(filter_rows)
+profiler.track("date range", df_filtered)
 
 # --- Saleyard Filter ---
 saleyard_options = sorted(set(df_filtered["Saleyard"].dropna().unique()).union(favourites))
@@ -44,23 +142,35 @@ fav_selected = None
 
 saleyards = st.sidebar.multiselect("Saleyards", saleyard_options, default=default_selection)
 if saleyards:
-    df_filtered = df_filtered[df_filtered["Saleyard"].isin(saleyards)]
+    filter_key += (("Saleyard", tuple(saleyards)),)
+    filter_rows = filter_step(filter_rows, filter_key, "Saleyard", saleyards)
+    df_filtered = df.take(filter_rows)
+    profiler.track("saleyard", df_filtered)
 
 # --- Dynamic Filters ---
 filtered_categories = sorted(df_filtered["Category"].dropna().unique())
 categories = st.sidebar.multiselect("Category", filtered_categories, key="category")
 if categories:
-    df_filtered = df_filtered[df_filtered["Category"].isin(categories)]
+    filter_key += (("Category", tuple(categories)),)
+    filter_rows = filter_step(filter_rows, filter_key, "Category", categories)
+    df_filtered = df.take(filter_rows)
+    profiler.track("category", df_filtered)
 
 filtered_weights = sorted(df_filtered["Weight Range"].dropna().unique())
 weights = st.sidebar.multiselect("Weight Range", filtered_weights, key="weight")
 if weights:
-    df_filtered = df_filtered[df_filtered["Weight Range"].isin(weights)]
+    filter_key += (("Weight Range", tuple(weights)),)
+    filter_rows = filter_step(filter_rows, filter_key, "Weight Range", weights)
+    df_filtered = df.take(filter_rows)
+    profiler.track("weight range", df_filtered)
 
 filtered_prefixes = sorted(df_filtered["Sale Prefix"].dropna().unique())
 prefixes = st.sidebar.multiselect("Sale Prefix", filtered_prefixes, key="prefix")
 if prefixes:
-    df_filtered = df_filtered[df_filtered["Sale Prefix"].isin(prefixes)]
+    filter_key += (("Sale Prefix", tuple(prefixes)),)
+    filter_rows = filter_step(filter_rows, filter_key, "Sale Prefix", prefixes)
+    df_filtered = df.take(filter_rows)
+    profiler.track("sale prefix", df_filtered)
 
 # --- Spacer ---
 st.sidebar.markdown("---")
@@ -85,34 +195,8 @@ st.header("Boonz's Table")
 if df_filtered.empty:
     st.warning("No data matches your filters.")
 else:
-    def custom_aggregations(group):
-        head_sum = group["Head Count"].sum()
-        if head_sum == 0:
-            return pd.Series({
-                "Sum of Av LW": 0,
-                "Sum of Av c/kg LW": 0,
-                "Sum of Av $/hd": 0
-            })
-        lw_numerator = ((group["Avg $/Head"] / group["Avg Lwt c/kg"]) * group["Head Count"]).sum()
-        ckg_numerator = (group["Avg Lwt c/kg"] * group["Head Count"]).sum()
-        dollar_numerator = (group["Avg $/Head"] * group["Head Count"]).sum()
-        return pd.Series({
-            "Sum of Av LW": (lw_numerator / head_sum) * 100,
-            "Sum of Av c/kg LW": ckg_numerator / head_sum / 100,
-            "Sum of Av $/hd": dollar_numerator / head_sum
-        })
-
-    pivot = df_filtered.groupby("Weight Range").apply(custom_aggregations).reset_index()
-    for col in ["Sum of Av LW", "Sum of Av c/kg LW", "Sum of Av $/hd"]:
-        pivot[col] = pivot[col].apply(lambda x: f"{x:,.2f}")
-
-    pivot = pivot.sort_values(by="Weight Range")
-
-    grand = custom_aggregations(df_filtered)
-    grand["Weight Range"] = "Grand Total"
-    for col in ["Sum of Av LW", "Sum of Av c/kg LW", "Sum of Av $/hd"]:
-        grand[col] = f"{grand[col]:,.2f}"
-    pivot = pd.concat([pivot, pd.DataFrame([grand])], ignore_index=True)
+    with profiler.stage("pivot"):
+        pivot = mla_reports.build_pivot(df_filtered)
 
     st.dataframe(
         pivot,
@@ -130,46 +214,17 @@ else:
     with st.expander("📥 Download Excel File"):
         include_all_filters = st.checkbox("Include all filters (category, weight, prefix)", value=False)
 
-        output = BytesIO()
-        with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-            workbook = writer.book
-            format_2dp = workbook.add_format({'num_format': '#,##0.00'})
-            format_int = workbook.add_format({'num_format': '0'})
-            format_default = workbook.add_format({})
-
-            def autosize_columns(df, worksheet, formats={}):
-                for idx, col in enumerate(df.columns):
-                    max_len = max(df[col].astype(str).map(len).max(), len(col)) + 2
-                    fmt = formats.get(col, format_default)
-                    worksheet.set_column(idx, idx, max_len, fmt)
-
-            pivot.to_excel(writer, sheet_name="Pivot Table", index=False)
-            autosize_columns(pivot, writer.sheets["Pivot Table"])
-
-            if include_all_filters:
-                export_df = df_filtered.copy()
-            else:
-                export_df = df[
-                    (df["Report Date"].isin(df_filtered["Report Date"])) &
-                    (df["Saleyard"].isin(df_filtered["Saleyard"]))
-                ].copy()
-
-            export_df.to_excel(writer, sheet_name="All Data", index=False)
-            autosize_columns(export_df, writer.sheets["All Data"], {
-                col: format_2dp if any(k in col for k in ["c/kg", "$", "Avg"]) and col not in ["Head Count", "Head Change"]
-                else format_int if col in ["Head Count", "Head Change"]
-                else format_default for col in export_df.columns
-            })
-
-            for cat in export_df["Category"].dropna().unique():
-                df_cat = export_df[export_df["Category"] == cat]
-                sheet_name = cat[:31]
-                df_cat.to_excel(writer, sheet_name=sheet_name, index=False)
-                autosize_columns(df_cat, writer.sheets[sheet_name])
+        if include_all_filters:
+            export_df = df_filtered.copy()
+        else:
+            export_df = mla_reports.export_rows(df, df_filtered)
+
+        with profiler.stage("excel"):
+            workbook_bytes = mla_reports.build_workbook(pivot, export_df)
 
         st.download_button(
             label="⬇️ Download Now",
-            data=output.getvalue(),
+            data=workbook_bytes,
             file_name="boonz_report.xlsx",
             mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
         )
@@ -180,72 +235,46 @@ else:
 
     
     # Apply all filters except Report Date range (for charts)
-    df_chart_filtered = df.copy()
-
-    # Apply saleyard filter
-    if saleyards:
-        df_chart_filtered = df_chart_filtered[df_chart_filtered["Saleyard"].isin(saleyards)]
-
-    # Apply category filter
-    if categories:
-        df_chart_filtered = df_chart_filtered[df_chart_filtered["Category"].isin(categories)]
-
-    # Apply weight range filter
-    if weights:
-        df_chart_filtered = df_chart_filtered[df_chart_filtered["Weight Range"].isin(weights)]
-
-    # Apply prefix filter
-    if prefixes:
-        df_chart_filtered = df_chart_filtered[df_chart_filtered["Sale Prefix"].isin(prefixes)]
-
-    # --- Weekly Chart Section ---
-    st.subheader("7 Day Rolling Average")
+    def chart_prefix_sums():
+        df_chart_filtered = df
+        if saleyards:
+            df_chart_filtered = df_chart_filtered[df_chart_filtered["Saleyard"].isin(saleyards)]
+        if categories:
+            df_chart_filtered = df_chart_filtered[df_chart_filtered["Category"].isin(categories)]
+        if weights:
+            df_chart_filtered = df_chart_filtered[df_chart_filtered["Weight Range"].isin(weights)]
+        if prefixes:
+            df_chart_filtered = df_chart_filtered[df_chart_filtered["Sale Prefix"].isin(prefixes)]
+        profiler.track("chart filters", df_chart_filtered)
+        return mla_reports.daily_prefix_sums(df_chart_filtered)
+
+    # Daily totals are cached per filter set, so changing the window or chart dates does not rescan rows
+    chart_key = ("chart", data_version, tuple(saleyards), tuple(categories), tuple(weights), tuple(prefixes))
+    with profiler.stage("chart totals"):
+        prefix_sums = session_filter(chart_key, chart_prefix_sums)
+
+    # --- Rolling Chart Section ---
+    st.subheader("Rolling Average")
+
+    window_days = st.selectbox("Rolling window", [7, 28, 90], format_func=lambda d: f"{d} days")
+    chart_start, chart_end = None, None
+    if not prefix_sums.empty:
+        first_day, last_day = prefix_sums.index.min().date(), prefix_sums.index.max().date()
+        chart_dates = st.date_input(
+            "Chart date range", value=(first_day, last_day), min_value=first_day, max_value=last_day
+        )
+        if len(chart_dates) == 2:
+            chart_start, chart_end = (pd.Timestamp(d) for d in chart_dates)
 
     # Metric selection
-    available_metrics = ["Sum of Av LW", "Sum of Av c/kg LW", "Sum of Av $/hd"]
+    available_metrics = list(mla_reports.METRICS)
     selected_metrics = [metric for metric in available_metrics if st.checkbox(metric, value=(metric == "Sum of Av $/hd"))]
 
-
-    if selected_metrics:
-        # Ensure we’re only using data from the filtered table
-        chart_data = df_chart_filtered.copy()
-
-        # Limit to data from 1 Jan 2024 onwards
-        chart_data = chart_data[chart_data["Report Date"] >= datetime.datetime(2024, 1, 1)]
-
-
-        # Group to weekly level
-        chart_data["Week"] = chart_data["Report Date"].dt.to_period("W").apply(lambda r: r.start_time)
-
-        for metric in selected_metrics:
-            # Determine what raw column this metric derives from
-            if metric == "Sum of Av LW":
-                lw_numerator = ((chart_data["Avg $/Head"] / chart_data["Avg Lwt c/kg"]) * chart_data["Head Count"])
-                chart_data["Rolling Numerator"] = lw_numerator * 100
-                chart_data["Rolling Denominator"] = chart_data["Head Count"]
-
-            elif metric == "Sum of Av c/kg LW":
-                ckg_numerator = chart_data["Avg Lwt c/kg"] * chart_data["Head Count"]
-                chart_data["Rolling Numerator"] = ckg_numerator / 100
-                chart_data["Rolling Denominator"] = chart_data["Head Count"]
-
-            elif metric == "Sum of Av $/hd":
-                dollar_numerator = chart_data["Avg $/Head"] * chart_data["Head Count"]
-                chart_data["Rolling Numerator"] = dollar_numerator
-                chart_data["Rolling Denominator"] = chart_data["Head Count"]
-
-            # Group and compute weekly weighted average
-            grouped = chart_data.groupby(["Week", "Weight Range"])[["Rolling Numerator", "Rolling Denominator"]].sum().reset_index()
-            grouped["Rolling Avg"] = grouped["Rolling Numerator"] / grouped["Rolling Denominator"]
-            grouped = grouped.dropna(subset=["Rolling Avg"])
-
-            grouped = grouped.dropna(subset=["Rolling Avg"])
-
-            chart_title = metric
-
-            st.markdown(f"**{chart_title} – Weekly Average by Weight Range**")
-            chart_df = grouped.pivot(index="Week", columns="Weight Range", values="Rolling Avg").sort_index()
-            st.line_chart(chart_df, use_container_width=True)
+    for metric in selected_metrics:
+        with profiler.stage(f"chart: {metric}"):
+            chart_df = mla_reports.rolling_average(prefix_sums, metric, window_days, chart_start, chart_end)
+        st.markdown(f"**{metric} – {window_days} Day Rolling Average by Weight Range**")
+        st.line_chart(chart_df, use_container_width=True)
 
     st.markdown("### ")
     st.markdown("### ")
@@ -253,17 +282,28 @@ else:
     
     # --- Used Saleyard Reports Summary ---
     st.subheader("📄 Saleyard Reports Used")
-    used_reports = (
-        df_filtered[["Saleyard", "Report Date"]]
-        .dropna()
-        .drop_duplicates()
-        .sort_values(by=["Saleyard", "Report Date"])
-    )
-    used_reports["Report Date"] = used_reports["Report Date"].dt.strftime("%-d %B %Y")
-    grouped = (
-        used_reports.groupby("Saleyard")["Report Date"]
-        .apply(lambda x: ", ".join(x))
-        .reset_index()
-        .rename(columns={"Report Date": "Report Dates"})
-    )
+    with profiler.stage("reports used"):
+        used_reports = (
+            df_filtered[["Saleyard", "Report Date"]]
+            .dropna()
+            .drop_duplicates()
+            .sort_values(by=["Saleyard", "Report Date"])
+        )
+        used_reports["Report Date"] = used_reports["Report Date"].dt.strftime("%-d %B %Y")
+        grouped = (
+            used_reports.groupby("Saleyard")["Report Date"]
+            .apply(lambda x: ", ".join(x))
+            .reset_index()
+            .rename(columns={"Report Date": "Report Dates"})
+        )
     st.dataframe(grouped, hide_index=True, use_container_width=True)
+
+# --- Profiling Panel ---
+profiler.finish({
+    "user": user,
+    "date_range": date_filter,
+    "saleyards": saleyards,
+    "categories": categories,
+    "weights": weights,
+    "prefixes": prefixes
+})
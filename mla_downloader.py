@@ -8,13 +8,15 @@ import time
 import glob
 import os
 from datetime import datetime
+from mla_config import load_config
 
 # --- Setup ---
 print("🚀 Initialising...")
-download_dir = os.path.abspath("downloads")
+config = load_config()
+download_dir = config["download_dir"]
 os.makedirs(download_dir, exist_ok=True)
 cutoff_date = datetime.strptime("01/01/2024", "%d/%m/%Y")
-log_file = "download_log.csv"
+log_file = config["download_log"]
 
 if os.path.exists(log_file):
     download_log = pd.read_csv(log_file)
@@ -0,0 +1,70 @@
+import pandas as pd
+from datetime import datetime
+
+KEEP_COLS = [
+    "Category", "Weight Range", "Sale Prefix", "Head Count", "Head Change",
+    "Min Lwt c/kg", "Max Lwt c/kg", "Avg Lwt c/kg", "Avg Lwt Change",
+    "Min $/Head", "Max $/Head", "Avg $/Head"
+]
+
+
+# --- Parse filename to get saleyard and date ---
+def parse_filename(filename):
+    if len(filename) <= 15:
+        print(f"⚠️ Filename too short or malformed: {filename}")
+        return None
+
+    base_name = filename[:-4]  # Strip .csv
+    date_str_raw = base_name[-10:]  # Expecting DD-MM-YYYY
+    try:
+        report_date_str = datetime.strptime(date_str_raw, "%d-%m-%Y").strftime("%d/%m/%Y")
+    except ValueError:
+        print(f"⚠️ Invalid date format in filename, skipping: {filename}")
+        return None
+
+    saleyard = base_name[:-11].replace("_", " ").strip()
+    print(f"📌 Parsed from filename → Saleyard: {saleyard}, Report Date: {report_date_str}")
+    return saleyard, report_date_str
+
+
+# --- Parse one MLA report into a data frame ---
+def parse_report(filename, lines):
+    parsed = parse_filename(filename)
+    if parsed is None:
+        return None
+    saleyard, report_date_str = parsed
+
+    header = None
+    data_started = False
+
+    for i, line in enumerate(lines):
+        if line.strip().startswith("Category,"):
+            header = line.strip().split(",")
+            data_start_index = i + 1
+            data_started = True
+            break
+
+    if not data_started:
+        print(f"⚠️ Skipping file {filename} — no data table found.")
+        return None
+
+    # --- Extract data rows ---
+    data_rows = []
+    for line in lines[data_start_index:]:
+        if line.strip() == "":
+            break
+        fields = line.strip().split(",")
+        if len(fields) >= len(header):
+            data_rows.append(fields[:len(header)])
+
+    if not data_rows:
+        print(f"⚠️ No data rows found in {filename}. Skipping.")
+        return None
+
+    df = pd.DataFrame(data_rows, columns=header)
+
+    # --- Keep only relevant columns ---
+    df = df[[col for col in KEEP_COLS if col in df.columns]].copy()
+    df["Saleyard"] = saleyard
+    df["Report Date"] = report_date_str
+    return df
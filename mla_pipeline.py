@@ -0,0 +1,127 @@
+import argparse
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import time
+
+import mla_code
+import mla_reports
+from mla_config import load_config
+
+STAGES = ["download", "merge", "refresh"]
+
+
+# --- Fingerprints ---
+def file_signature(path):
+    if not os.path.exists(path):
+        return None
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def digest(value):
+    return hashlib.sha256(json.dumps(value, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def download_fingerprint(config, previous):
+    # The MLA site can't be fingerprinted cheaply, so the fingerprint is the time of the
+    # last download, kept until download_interval_hours have passed since it
+    interval = config["download_interval_hours"] * 3600
+    if isinstance(previous, (int, float)) and time.time() - previous < interval:
+        return previous
+    return time.time()
+
+
+def merge_fingerprint(config, previous):
+    download_dir = config["download_dir"]
+    downloads = sorted(
+        [name] + file_signature(os.path.join(download_dir, name))
+        for name in os.listdir(download_dir)
+        if name.endswith(".csv")
+    ) if os.path.isdir(download_dir) else []
+    log_hash = None
+    if os.path.exists(config["download_log"]):
+        with open(config["download_log"], "rb") as f:
+            log_hash = hashlib.sha256(f.read()).hexdigest()
+    return digest({"log": log_hash, "downloads": downloads, "excel": file_signature(config["output_excel"])})
+
+
+def refresh_fingerprint(config, previous):
+    return digest({
+        "excel": file_signature(config["output_excel"]),
+        "dashboard_data": file_signature(config["dashboard_data"])
+    })
+
+
+# --- Stages ---
+def run_download(config):
+    downloader = os.path.join(os.path.dirname(os.path.abspath(__file__)), "mla_downloader.py")
+    env = dict(os.environ, MLA_CONFIG=config["config_path"])
+    subprocess.run([sys.executable, downloader], env=env, check=True)
+
+
+def run_refresh(config):
+    if not os.path.exists(config["output_excel"]):
+        print(f"⚠️ No merged workbook at {config['output_excel']}, nothing to refresh.")
+        return
+    mla_reports.refresh_dashboard_data(config)
+
+
+STAGE_FUNCTIONS = {
+    "download": (download_fingerprint, run_download),
+    "merge": (merge_fingerprint, mla_code.merge),
+    "refresh": (refresh_fingerprint, run_refresh)
+}
+
+
+# --- State ---
+def load_state(path):
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    return {}
+
+
+def save_state(path, state):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def run_pipeline(config, force=False, skip=()):
+    """Run download → merge → refresh, skipping stages whose inputs are unchanged."""
+    state = load_state(config["pipeline_state"])
+
+    for stage in STAGES:
+        fingerprint, run = STAGE_FUNCTIONS[stage]
+        if stage in skip:
+            print(f"⏭️ {stage}: skipped by request")
+            continue
+        if not force and state.get(stage) == fingerprint(config, state.get(stage)):
+            print(f"⏭️ {stage}: inputs unchanged")
+            continue
+
+        print(f"▶️ {stage}: running...")
+        started = time.perf_counter()
+        run(config)
+        # Record the inputs as they stand after the stage, so the next run compares like with like
+        state[stage] = fingerprint(config, None)
+        save_state(config["pipeline_state"], state)
+        print(f"✅ {stage}: done in {time.perf_counter() - started:.1f}s")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the MLA download, merge and dashboard refresh pipeline.")
+    parser.add_argument("--config", help="Path to mla_config.json (defaults to $MLA_CONFIG or ./mla_config.json)")
+    parser.add_argument("--force", action="store_true", help="Run every stage even if its inputs are unchanged")
+    parser.add_argument("--skip", action="append", choices=STAGES, default=[], help="Skip a stage (repeatable)")
+    args = parser.parse_args(argv)
+
+    run_pipeline(load_config(args.config), force=args.force, skip=args.skip)
+
+
+if __name__ == "__main__":
+    main()
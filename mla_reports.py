@@ -0,0 +1,287 @@
+import argparse
+import datetime
+import os
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+
+import pandas as pd
+from mla_config import load_config
+
+# --- Metrics ---
+# Each metric is a head-weighted average: sum(numerator) / sum(head) * scale, where a row
+# only counts towards a metric (numerator and head) when its numerator is finite
+METRICS = {
+    "Sum of Av LW": ("LW Numerator", "LW Head", 100),
+    "Sum of Av c/kg LW": ("c/kg Numerator", "c/kg Head", 0.01),
+    "Sum of Av $/hd": ("$/hd Numerator", "$/hd Head", 1),
+}
+TOTAL_COLUMNS = [col for numerator, head, _ in METRICS.values() for col in (numerator, head)]
+DATE_WINDOWS = {
+    "Last 7 Days": 7,
+    "Last 30 Days": 30,
+    "Last 60 Days": 60,
+    "Last 90 Days": 90,
+    "Last 180 Days": 180
+}
+REPORT_KEYS = ["Saleyard", "Category", "Report Date", "Weight Range"]
+
+
+def window_cutoff(days, as_of=None):
+    """Earliest Report Date in a window of days ending on as_of (default today), from midnight."""
+    as_of = as_of or datetime.date.today()
+    return pd.Timestamp(as_of).normalize() - pd.Timedelta(days=days)
+
+
+# --- Loading ---
+def load_dataset(path="final_mla_output.xlsx"):
+    # Pickled dashboard data is already cleaned and much faster to read than the workbook
+    if path.endswith(".pkl"):
+        return pd.read_pickle(path)
+    df = pd.read_excel(path)
+    df["Report Date"] = pd.to_datetime(df["Report Date"], dayfirst=True, errors='coerce')
+    for col in ["Saleyard", "Category", "Weight Range", "Sale Prefix"]:
+        df[col] = df[col].astype(str).str.strip()
+    return df
+
+
+def dataset_path(config):
+    """Prefer the refreshed dashboard data unless the workbook is newer."""
+    data, excel = config["dashboard_data"], config["output_excel"]
+    if os.path.exists(data) and (not os.path.exists(excel) or os.path.getmtime(data) >= os.path.getmtime(excel)):
+        return data
+    return excel
+
+
+def refresh_dashboard_data(config):
+    df = load_dataset(config["output_excel"])
+    tmp_path = config["dashboard_data"] + ".tmp"
+    df.to_pickle(tmp_path)
+    os.replace(tmp_path, config["dashboard_data"])
+    print(f"✅ Dashboard data refreshed: {config['dashboard_data']} ({len(df)} rows)")
+
+
+def load_favourites(path="favourites.csv"):
+    fav_df = pd.read_csv(path)
+    return {
+        row["User"]: row.iloc[1:].dropna().tolist()
+        for _, row in fav_df.iterrows()
+    }
+
+
+# --- Aggregation ---
+def weighted_columns(df):
+    """Per-row head-weighted numerators and heads; sums of these give every metric.
+
+    Rows with a non-finite numerator (e.g. Avg Lwt c/kg of 0 for LW) are left
+    out of that metric entirely rather than diluting it with their head count.
+    """
+    head = df["Head Count"]
+    numerators = {
+        "LW Numerator": (df["Avg $/Head"] / df["Avg Lwt c/kg"]) * head,
+        "c/kg Numerator": df["Avg Lwt c/kg"] * head,
+        "$/hd Numerator": df["Avg $/Head"] * head,
+    }
+    columns = {}
+    for numerator, head_col, _ in METRICS.values():
+        value = numerators[numerator]
+        valid = value.replace([float("inf"), float("-inf")], float("nan")).notna()
+        columns[numerator] = value.where(valid, 0)
+        columns[head_col] = head.where(valid, 0)
+    return pd.DataFrame(columns, index=df.index)
+
+
+def weighted_averages(totals):
+    """Turn summed numerators into metric values (0 where no head were sold)."""
+    return pd.DataFrame({
+        metric: (totals[numerator] / totals[head] * scale).where(totals[head] != 0, 0)
+        for metric, (numerator, head, scale) in METRICS.items()
+    }, index=totals.index)
+
+
+def report_totals(df):
+    """Sum the weighted columns once per saleyard, category, date and weight range.
+
+    Every report variant is a filter and re-sum of this much smaller frame.
+    """
+    totals = pd.concat([df[REPORT_KEYS], weighted_columns(df)], axis=1)
+    return totals.groupby(REPORT_KEYS)[TOTAL_COLUMNS].sum().reset_index()
+
+
+def pivot_from_totals(totals):
+    """Boonz's Table: weighted averages per Weight Range plus a Grand Total row."""
+    by_weight = totals.groupby("Weight Range")[TOTAL_COLUMNS].sum()
+    pivot = weighted_averages(by_weight).reset_index().sort_values(by="Weight Range")
+    grand = weighted_averages(totals[TOTAL_COLUMNS].sum().to_frame().T).iloc[0]
+    grand["Weight Range"] = "Grand Total"
+    pivot = pd.concat([pivot, pd.DataFrame([grand])], ignore_index=True)
+    for col in METRICS:
+        pivot[col] = pivot[col].apply(lambda x: f"{x:,.2f}")
+    return pivot[["Weight Range"] + list(METRICS)]
+
+
+def build_pivot(df):
+    return pivot_from_totals(report_totals(df))
+
+
+def daily_prefix_sums(df):
+    """Running totals of head and numerators per day, one column pair per Weight Range.
+
+    Built once per filter set; any window sum is then the difference of two rows.
+    """
+    weighted = weighted_columns(df)
+    weighted["Report Date"] = df["Report Date"].dt.normalize()
+    weighted["Weight Range"] = df["Weight Range"]
+    daily = weighted.groupby(["Report Date", "Weight Range"])[TOTAL_COLUMNS].sum().unstack("Weight Range")
+    if daily.empty:
+        return daily
+    calendar = pd.date_range(daily.index.min(), daily.index.max(), freq="D", name="Report Date")
+    return daily.reindex(calendar, fill_value=0).fillna(0).cumsum()
+
+
+def rolling_average(prefix_sums, metric, window_days, start=None, end=None):
+    """Head-weighted rolling average over the trailing window_days, per Weight Range."""
+    numerator, head_col, scale = METRICS[metric]
+    if prefix_sums.empty:
+        return pd.DataFrame()
+    window = prefix_sums - prefix_sums.shift(window_days, fill_value=0)
+    head = window[head_col]
+    rolling = (window[numerator] * scale / head).where(head > 0)
+    return rolling.loc[start:end].dropna(how="all")
+
+
+def export_rows(df, df_filtered):
+    """Rows for the same saleyards and report dates as the filtered data, ignoring other filters."""
+    return df[
+        (df["Report Date"].isin(df_filtered["Report Date"])) &
+        (df["Saleyard"].isin(df_filtered["Saleyard"]))
+    ].copy()
+
+
+# --- Excel Export ---
+def build_workbook(pivot, export_df):
+    output = BytesIO()
+    with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
+        workbook = writer.book
+        format_2dp = workbook.add_format({'num_format': '#,##0.00'})
+        format_int = workbook.add_format({'num_format': '0'})
+        format_default = workbook.add_format({})
+
+        def autosize_columns(df, worksheet, formats={}):
+            for idx, col in enumerate(df.columns):
+                max_len = max(df[col].astype(str).map(len).max(), len(col)) + 2
+                fmt = formats.get(col, format_default)
+                worksheet.set_column(idx, idx, max_len, fmt)
+
+        pivot.to_excel(writer, sheet_name="Pivot Table", index=False)
+        autosize_columns(pivot, writer.sheets["Pivot Table"])
+
+        export_df.to_excel(writer, sheet_name="All Data", index=False)
+        autosize_columns(export_df, writer.sheets["All Data"], {
+            col: format_2dp if any(k in col for k in ["c/kg", "$", "Avg"]) and col not in ["Head Count", "Head Change"]
+            else format_int if col in ["Head Count", "Head Change"]
+            else format_default for col in export_df.columns
+        })
+
+        for cat in export_df["Category"].dropna().unique():
+            df_cat = export_df[export_df["Category"] == cat]
+            sheet_name = cat[:31]
+            df_cat.to_excel(writer, sheet_name=sheet_name, index=False)
+            autosize_columns(df_cat, writer.sheets[sheet_name])
+    return output.getvalue()
+
+
+def write_workbooks(job):
+    """Write every pivot variant that shares one export frame.
+
+    Grouping by export frame means it is sent to the worker process once;
+    its data sheets still have to be written into each workbook.
+    """
+    out_dir, export_df, variants = job
+    paths = []
+    for name, pivot in variants:
+        path = os.path.join(out_dir, name)
+        with open(path, "wb") as f:
+            f.write(build_workbook(pivot, export_df))
+        paths.append(path)
+    return paths
+
+
+# --- Batch Reports ---
+def report_filename(saleyard, category, days):
+    parts = [saleyard, category or "All", f"{days}d"]
+    safe = ["".join(c if c.isalnum() else "_" for c in part) for part in parts]
+    return "boonz_" + "_".join(safe) + ".xlsx"
+
+
+def plan_reports(df, saleyards, windows, categories=None, as_of=None):
+    """Build (export rows, [(filename, pivot), ...]) for every saleyard × window.
+
+    Each group holds the All and per-category pivots that share one set of
+    export rows. The weighted totals and per-saleyard row groups are computed
+    once and shared by all variants.
+    """
+    df = df[df["Saleyard"].isin(saleyards)]
+    totals = report_totals(df)
+    totals_by_yard = dict(tuple(totals.groupby("Saleyard")))
+    rows_by_yard = dict(tuple(df.groupby("Saleyard")))
+
+    jobs = []
+    for saleyard in saleyards:
+        if saleyard not in totals_by_yard:
+            print(f"⚠️ No data for saleyard: {saleyard}")
+            continue
+        yard_totals = totals_by_yard[saleyard]
+        yard_rows = rows_by_yard[saleyard]
+        for days in windows:
+            window_totals = yard_totals[yard_totals["Report Date"] >= window_cutoff(days, as_of)]
+            if window_totals.empty:
+                continue
+            export_df = yard_rows[yard_rows["Report Date"].isin(window_totals["Report Date"])]
+            yard_categories = categories or sorted(window_totals["Category"].unique())
+            variants = []
+            for category in [None] + list(yard_categories):
+                variant = window_totals if category is None else window_totals[window_totals["Category"] == category]
+                if variant.empty:
+                    continue
+                variants.append((report_filename(saleyard, category, days), pivot_from_totals(variant)))
+            jobs.append((export_df, variants))
+    return jobs
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write Boonz report workbooks for favourite saleyards.")
+    parser.add_argument("--data", help="Defaults to the configured dashboard data or workbook")
+    parser.add_argument("--favourites", help="Defaults to the configured favourites.csv")
+    parser.add_argument("--user", action="append", help="Only include this user's favourites (repeatable)")
+    parser.add_argument("--category", action="append", help="Only report these categories (repeatable)")
+    parser.add_argument("--window", action="append", type=int, help="Date window in days (repeatable)")
+    parser.add_argument("--as-of", type=lambda s: datetime.datetime.strptime(s, "%Y-%m-%d"))
+    parser.add_argument("--out-dir", help="Defaults to the configured reports_dir")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    print("🚀 Building Boonz reports...")
+    config = load_config()
+    df = load_dataset(args.data or dataset_path(config))
+    favourites = load_favourites(args.favourites or config["favourites"])
+    users = args.user or list(favourites)
+    saleyards = list(dict.fromkeys(yard for user in users for yard in favourites.get(user, [])))
+    windows = args.window or list(DATE_WINDOWS.values())
+
+    out_dir = args.out_dir or config["reports_dir"]
+
+    jobs = plan_reports(df, saleyards, windows, args.category, args.as_of)
+    os.makedirs(out_dir, exist_ok=True)
+    jobs = [(out_dir, export_df, variants) for export_df, variants in jobs]
+
+    written = 0
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        for paths in pool.map(write_workbooks, jobs):
+            for path in paths:
+                print(f"✅ Saved: {path}")
+            written += len(paths)
+    print(f"📊 {written} report(s) written to {out_dir}")
+
+
+if __name__ == "__main__":
+    main()